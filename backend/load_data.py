@@ -4,10 +4,290 @@ This script reads all JSON files from the data directory, processes them,
 and loads them into a SQLite database with separate tables for songs, podcasts, and audiobooks.
 """
 
-import json
 import sqlite3
+from datetime import datetime, timezone
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import pandas as pd
+import orjson
+
+# The API's per-connection tuning (see main.CONNECTION_PRAGMAS), plus
+# journal_mode=WAL: a persistent setting on the file, so the loader makes it
+# once on behalf of the API, which may only have the database read-only
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
+# Streams shorter than this are treated as noise and skipped
+MIN_MS_PLAYED = 5000
+
+# Larger pages suit the wide, scan-heavy songs table
+PAGE_SIZE = 8192
+
+# Every table and view (re)created by a load
+LOADED_TABLES = (
+    "streams",
+    "songs_fts",
+    "daily_rollup",
+    "artist_daily",
+    "songs",
+    "podcasts",
+    "audiobooks",
+)
+
+TABLE_SCHEMAS = (
+    """
+    CREATE TABLE songs (
+        id INTEGER PRIMARY KEY,
+        endTime INTEGER,
+        msPlayed INTEGER,
+        artistName TEXT,
+        trackName TEXT,
+        albumName TEXT,
+        trackUri TEXT,
+        year INTEGER,
+        month INTEGER,
+        date TEXT
+    )
+    """,
+    # Legacy "streams" name kept for backward compatibility, as a view over
+    # songs so the data is stored (and indexed) only once
+    """
+    CREATE VIEW streams AS
+    SELECT endTime, msPlayed, artistName, trackName
+    FROM songs
+    """,
+    # Full-text index over song and artist names for /api/search. It stores
+    # no text of its own (content='songs') and is keyed by songs.id, an
+    # explicit INTEGER PRIMARY KEY: VACUUM may renumber implicit rowids,
+    # which would silently point the index at the wrong songs.
+    """
+    CREATE VIRTUAL TABLE songs_fts USING fts5(
+        trackName,
+        artistName,
+        content='songs',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    # Per-day and per-artist-per-day rollups of songs, so the calendar,
+    # trends and stats endpoints read a few thousand rows instead of every play
+    """
+    CREATE TABLE daily_rollup (
+        date TEXT PRIMARY KEY,
+        year INTEGER,
+        month INTEGER,
+        stream_count INTEGER,
+        total_ms INTEGER
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE artist_daily (
+        artistName TEXT,
+        date TEXT,
+        year INTEGER,
+        month INTEGER,
+        stream_count INTEGER,
+        total_ms INTEGER,
+        PRIMARY KEY (artistName, date)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE podcasts (
+        endTime INTEGER,
+        msPlayed INTEGER,
+        showName TEXT,
+        episodeName TEXT,
+        episodeUri TEXT
+    )
+    """,
+    """
+    CREATE TABLE audiobooks (
+        endTime INTEGER,
+        msPlayed INTEGER,
+        bookTitle TEXT,
+        chapterTitle TEXT,
+        bookUri TEXT,
+        chapterUri TEXT
+    )
+    """,
+)
+
+# Created after the bulk insert, when SQLite can build each one in a single sort
+INDEX_SCHEMAS = (
+    "CREATE INDEX idx_songs_endtime ON songs(endTime)",
+    "CREATE INDEX idx_songs_album ON songs(albumName)",
+    "CREATE INDEX idx_songs_year_month ON songs(year, month)",
+    # Covering index: the top-songs part of /api/stats reads only these
+    # columns, so SQLite answers it without touching the table itself. Its
+    # leading columns also serve per-track trend lookups. Artist and daily
+    # totals come from the rollup tables instead.
+    "CREATE INDEX idx_songs_track_artist_ms ON songs(trackName, artistName, msPlayed)",
+    # Serves /api/daily-songs entirely from the index, already in time order
+    "CREATE INDEX idx_songs_daily ON songs(date, endTime, trackName, artistName, albumName, msPlayed)",
+    "CREATE INDEX idx_podcasts_endtime ON podcasts(endTime)",
+    "CREATE INDEX idx_podcasts_show ON podcasts(showName)",
+    "CREATE INDEX idx_audiobooks_endtime ON audiobooks(endTime)",
+    "CREATE INDEX idx_audiobooks_book ON audiobooks(bookTitle)",
+)
+
+
+INSERT_STATEMENTS = {
+    "songs": "INSERT INTO songs VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "podcasts": "INSERT INTO podcasts VALUES (?, ?, ?, ?, ?)",
+    "audiobooks": "INSERT INTO audiobooks VALUES (?, ?, ?, ?, ?, ?)",
+}
+
+# Run once songs and its indexes are in place
+ROLLUP_STATEMENTS = (
+    """
+    INSERT INTO daily_rollup
+    SELECT date, year, month, COUNT(*), SUM(msPlayed)
+    FROM songs
+    GROUP BY date, year, month
+    """,
+    """
+    INSERT INTO artist_daily
+    SELECT artistName, date, year, month, COUNT(*), SUM(msPlayed)
+    FROM songs
+    WHERE artistName IS NOT NULL
+    GROUP BY artistName, date, year, month
+    """,
+    "CREATE INDEX idx_daily_rollup_year_month ON daily_rollup(year, month)",
+)
+
+
+def drop_tables(conn):
+    """Drop every table and view the loader creates, along with their indexes."""
+    # Look up each object's type: streams was a table in older databases
+    # and is a view now, and each needs its own DROP statement
+    placeholders = ", ".join("?" for _ in LOADED_TABLES)
+    existing = conn.execute(
+        f"SELECT type, name FROM sqlite_master WHERE name IN ({placeholders})",
+        LOADED_TABLES,
+    ).fetchall()
+    for kind, name in existing:
+        conn.execute(f"DROP {kind.upper()} {name}")
+
+
+def read_history_file(json_file):
+    """Read and parse a single streaming history JSON file."""
+    return orjson.loads(json_file.read_bytes())
+
+
+def iter_history_files(json_files):
+    """
+    Yield (json_file, streams) for each file in order.
+
+    The next file is read and parsed on a background thread while the
+    current one is being inserted, so disk reads overlap with the load.
+    Only one file is read ahead: parsing holds the GIL, so more threads
+    would not parse any faster and would only keep more files in memory.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = None
+        for json_file in json_files:
+            future = executor.submit(read_history_file, json_file)
+            if pending is not None:
+                yield pending[0], pending[1].result()
+            pending = (json_file, future)
+        if pending is not None:
+            yield pending[0], pending[1].result()
+
+
+def split_streams(streams, counts):
+    """
+    Clean one file's raw streams and split them by content type.
+
+    Updates the running totals in counts and returns a dict mapping each
+    table name to the list of row tuples to insert into it.
+    """
+    songs, podcasts, audiobooks = [], [], []
+    counts["loaded"] += len(streams)
+
+    for stream in streams:
+        # Filter out noise (streams less than 5 seconds)
+        ms_played = stream.get("ms_played")
+        if ms_played is None or ms_played < MIN_MS_PLAYED:
+            counts["filtered"] += 1
+            continue
+
+        # Timestamps are stored as integer Unix seconds (UTC), parsed from
+        # Spotify's ISO-8601 text, e.g. "2024-06-15T14:30:00Z". fromisoformat
+        # only accepts the "Z" suffix from Python 3.11, so spell it as an offset.
+        ts = stream.get("ts")
+        if ts is not None:
+            played_at = datetime.fromisoformat(ts.replace("Z", "+00:00")).astimezone(
+                timezone.utc
+            )
+            end_time = int(played_at.timestamp())
+        else:
+            end_time = None
+
+        # Songs: have spotify_track_uri
+        if stream.get("spotify_track_uri") is not None:
+            counts["songs"] += 1
+            track_name = stream.get("master_metadata_track_name")
+            # Only keep songs with valid data
+            if end_time is not None and track_name is not None:
+                # Precompute calendar parts so the API can filter and group on
+                # indexed columns instead of calling strftime()/DATE() per row
+                songs.append(
+                    (
+                        end_time,
+                        ms_played,
+                        stream.get("master_metadata_album_artist_name"),
+                        track_name,
+                        stream.get("master_metadata_album_album_name"),
+                        stream["spotify_track_uri"],
+                        played_at.year,
+                        played_at.month,
+                        f"{played_at.year:04d}-{played_at.month:02d}-{played_at.day:02d}",
+                    )
+                )
+
+        # Podcasts: have spotify_episode_uri
+        if stream.get("spotify_episode_uri") is not None:
+            counts["podcasts"] += 1
+            if end_time is not None:
+                podcasts.append(
+                    (
+                        end_time,
+                        ms_played,
+                        stream.get("episode_show_name"),
+                        stream.get("episode_name"),
+                        stream["spotify_episode_uri"],
+                    )
+                )
+
+        # Audiobooks: have audiobook_uri
+        if stream.get("audiobook_uri") is not None:
+            counts["audiobooks"] += 1
+            if end_time is not None:
+                audiobooks.append(
+                    (
+                        end_time,
+                        ms_played,
+                        stream.get("audiobook_title"),
+                        stream.get("audiobook_chapter_title"),
+                        stream["audiobook_uri"],
+                        stream.get("audiobook_chapter_uri"),
+                    )
+                )
+
+    counts["songs_final"] += len(songs)
+    counts["podcasts_final"] += len(podcasts)
+    counts["audiobooks_final"] += len(audiobooks)
+
+    return {
+        "songs": songs,
+        "podcasts": podcasts,
+        "audiobooks": audiobooks,
+    }
 
 
 def load_streaming_history():
@@ -44,145 +324,89 @@ def load_streaming_history():
 
     print(f"Found {len(json_files)} streaming history files")
 
-    # Read and combine all JSON files
-    all_streams = []
-    for json_file in sorted(json_files):
-        print(f"Reading {json_file.name}...")
-        with open(json_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            all_streams.extend(data)
-
-    print(f"Total streams loaded: {len(all_streams)}")
-
-    # Convert to DataFrame
-    df = pd.DataFrame(all_streams)
-
-    print("Processing data...")
-
-    # Convert timestamp to datetime
-    df["endTime"] = pd.to_datetime(df["ts"])
-
-    # Ensure msPlayed is numeric
-    df["msPlayed"] = pd.to_numeric(df["ms_played"], errors="coerce")
-
-    # Filter out noise (streams less than 5 seconds)
-    initial_count = len(df)
-    df = df[df["msPlayed"] >= 5000]
-    filtered_count = initial_count - len(df)
-    print(f"Filtered out {filtered_count} streams with less than 5 seconds of playtime")
-
-    # Separate into different content types based on URI fields
-    print("\nSeparating content types...")
-
-    # Songs: have spotify_track_uri
-    df_songs = df[df["spotify_track_uri"].notna()].copy()
-    df_songs["artistName"] = df_songs["master_metadata_album_artist_name"]
-    df_songs["trackName"] = df_songs["master_metadata_track_name"]
-    df_songs["albumName"] = df_songs["master_metadata_album_album_name"]
-    df_songs["trackUri"] = df_songs["spotify_track_uri"]
-
-    # Podcasts: have spotify_episode_uri
-    df_podcasts = df[df["spotify_episode_uri"].notna()].copy()
-    df_podcasts["showName"] = df_podcasts["episode_show_name"]
-    df_podcasts["episodeName"] = df_podcasts["episode_name"]
-    df_podcasts["episodeUri"] = df_podcasts["spotify_episode_uri"]
-
-    # Audiobooks: have audiobook_uri
-    df_audiobooks = df[df["audiobook_uri"].notna()].copy()
-    df_audiobooks["bookTitle"] = df_audiobooks["audiobook_title"]
-    df_audiobooks["chapterTitle"] = df_audiobooks["audiobook_chapter_title"]
-    df_audiobooks["bookUri"] = df_audiobooks["audiobook_uri"]
-    df_audiobooks["chapterUri"] = df_audiobooks["audiobook_chapter_uri"]
-
-    print(f"  Songs: {len(df_songs)}")
-    print(f"  Podcast episodes: {len(df_podcasts)}")
-    print(f"  Audiobook chapters: {len(df_audiobooks)}")
-
-    # Prepare songs table - only keeping songs with valid data
-    df_songs_final = df_songs[
-        ["endTime", "msPlayed", "artistName", "trackName", "albumName", "trackUri"]
-    ].copy()
-    df_songs_final = df_songs_final.dropna(subset=["endTime", "msPlayed", "trackName"])
-
-    # Prepare podcasts table
-    df_podcasts_final = df_podcasts[
-        ["endTime", "msPlayed", "showName", "episodeName", "episodeUri"]
-    ].copy()
-    df_podcasts_final = df_podcasts_final.dropna(subset=["endTime", "msPlayed"])
-
-    # Prepare audiobooks table
-    df_audiobooks_final = df_audiobooks[
-        ["endTime", "msPlayed", "bookTitle", "chapterTitle", "bookUri", "chapterUri"]
-    ].copy()
-    df_audiobooks_final = df_audiobooks_final.dropna(subset=["endTime", "msPlayed"])
-
-    print(f"\nFinal counts after cleaning:")
-    print(f"  Songs: {len(df_songs_final)}")
-    print(f"  Podcast episodes: {len(df_podcasts_final)}")
-    print(f"  Audiobook chapters: {len(df_audiobooks_final)}")
-
-    # Save to SQLite
     print(f"\nSaving to database: {db_path}")
     conn = sqlite3.connect(db_path)
 
-    # Drop existing tables if they exist
-    conn.execute("DROP TABLE IF EXISTS streams")  # Legacy table
-    conn.execute("DROP TABLE IF EXISTS songs")
-    conn.execute("DROP TABLE IF EXISTS podcasts")
-    conn.execute("DROP TABLE IF EXISTS audiobooks")
+    # page_size cannot change while in WAL mode, so leave WAL first. Only do
+    # this when needed: leaving WAL requires that no other process (such as
+    # a running API) has the database open. VACUUM rebuilds the file with
+    # the new page size and keeps its contents, which are replaced below.
+    if conn.execute("PRAGMA page_size").fetchone()[0] != PAGE_SIZE:
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.execute(f"PRAGMA page_size={PAGE_SIZE}")
+        conn.execute("VACUUM")
+
+    # Switch (persistently) to WAL for the load and for the API afterwards
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+
+    # Replace everything in one transaction, so a failed load leaves the
+    # previous data intact. Dropping the old tables also drops their indexes,
+    # so no index exists while rows are inserted; all of them are built once
+    # at the end, and each row costs a single B-tree append instead of a
+    # commit and per-index updates.
+    conn.execute("BEGIN")
+    drop_tables(conn)
+    for statement in TABLE_SCHEMAS:
+        conn.execute(statement)
+
+    # Process one file at a time (parse, clean, insert, discard) so memory
+    # use is bounded by file size rather than by the whole history
+    counts = Counter()
+    for json_file, streams in iter_history_files(sorted(json_files)):
+        print(f"Processing {json_file.name}...")
+        for table, rows in split_streams(streams, counts).items():
+            conn.executemany(INSERT_STATEMENTS[table], rows)
+
+    for statement in INDEX_SCHEMAS:
+        conn.execute(statement)
+    for statement in ROLLUP_STATEMENTS:
+        conn.execute(statement)
+    conn.execute("INSERT INTO songs_fts(songs_fts) VALUES ('rebuild')")
 
-    # Save songs to database (main focus)
-    df_songs_final.to_sql("songs", conn, if_exists="replace", index=False)
-
-    # Create indexes for songs table
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_songs_endtime ON songs(endTime)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_songs_artist ON songs(artistName)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_songs_track ON songs(trackName)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_songs_album ON songs(albumName)")
+    conn.commit()
 
-    # Also keep the old "streams" table pointing to songs for backward compatibility
-    df_songs_final[["endTime", "msPlayed", "artistName", "trackName"]].to_sql(
-        "streams", conn, if_exists="replace", index=False
+    # Gather statistics so the query planner can choose between the indexes,
+    # then compact the pages freed by dropping the previous tables. None of
+    # these can run inside a transaction; commit() above has closed it. In
+    # WAL mode VACUUM writes the whole database to the WAL, so checkpoint and
+    # truncate it afterwards rather than leaving a file as large as the
+    # database next to it.
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    print(f"\nTotal streams loaded: {counts['loaded']}")
+    print(
+        f"Filtered out {counts['filtered']} streams with less than 5 seconds of playtime"
     )
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_streams_endtime ON streams(endTime)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_streams_artist ON streams(artistName)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_streams_track ON streams(trackName)")
-
-    # Save podcasts to database (for future use)
-    if len(df_podcasts_final) > 0:
-        df_podcasts_final.to_sql("podcasts", conn, if_exists="replace", index=False)
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_podcasts_endtime ON podcasts(endTime)"
-        )
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_podcasts_show ON podcasts(showName)"
-        )
-
-    # Save audiobooks to database (for future use)
-    if len(df_audiobooks_final) > 0:
-        df_audiobooks_final.to_sql("audiobooks", conn, if_exists="replace", index=False)
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_audiobooks_endtime ON audiobooks(endTime)"
-        )
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_audiobooks_book ON audiobooks(bookTitle)"
-        )
+    print("\nContent types:")
+    print(f"  Songs: {counts['songs']}")
+    print(f"  Podcast episodes: {counts['podcasts']}")
+    print(f"  Audiobook chapters: {counts['audiobooks']}")
 
-    conn.commit()
-    conn.close()
+    print(f"\nFinal counts after cleaning:")
+    print(f"  Songs: {counts['songs_final']}")
+    print(f"  Podcast episodes: {counts['podcasts_final']}")
+    print(f"  Audiobook chapters: {counts['audiobooks_final']}")
 
     print("\nData loading complete!")
-    print(
-        f"\nSongs date range: {df_songs_final['endTime'].min()} to {df_songs_final['endTime'].max()}"
-    )
-    if len(df_podcasts_final) > 0:
-        print(
-            f"Podcasts date range: {df_podcasts_final['endTime'].min()} to {df_podcasts_final['endTime'].max()}"
-        )
-    if len(df_audiobooks_final) > 0:
-        print(
-            f"Audiobooks date range: {df_audiobooks_final['endTime'].min()} to {df_audiobooks_final['endTime'].max()}"
-        )
+    print()
+    for table, label in (
+        ("songs", "Songs"),
+        ("podcasts", "Podcasts"),
+        ("audiobooks", "Audiobooks"),
+    ):
+        first, last = conn.execute(
+            f"SELECT MIN(endTime), MAX(endTime) FROM {table}"
+        ).fetchone()
+        if first is not None:
+            first = datetime.fromtimestamp(first, timezone.utc)
+            last = datetime.fromtimestamp(last, timezone.utc)
+            print(f"{label} date range: {first} to {last}")
+
+    conn.close()
 
 
 if __name__ == "__main__":
@@ -2,18 +2,32 @@
 FastAPI backend for Spotify streaming history analysis.
 """
 
+import queue
 import sqlite3
 from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
+from typing import Annotated, Any, Dict, List, Optional, Tuple
 
+import orjson
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from pydantic import Field
+
+
+class OrjsonResponse(JSONResponse):
+    """JSON response serialized with orjson instead of the stdlib json module."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
 
 app = FastAPI(
     title="Spotify Analytics API",
     description="API for analyzing personal Spotify streaming history",
     version="1.0.0",
+    default_response_class=OrjsonResponse,
 )
 
 # Enable CORS for frontend
@@ -31,16 +45,108 @@ app.add_middleware(
 # Database path
 DB_PATH = Path(__file__).parent / "spotify.db"
 
+# Per-connection tuning: fewer fsyncs, in-memory temp tables, memory-mapped
+# I/O and a 64 MiB page cache. journal_mode is deliberately absent: it is a
+# persistent write to the database file, which the API may only have
+# read-only (see compose.yml); load_data.py switches the file to WAL instead.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
+# A month number; query parameters such as "06" are parsed to 6
+Month = Annotated[int, Field(ge=1, le=12)]
+
+# Months (1-12) covered by each season, in the order seasons are displayed
+SEASON_TO_MONTHS = {
+    "spring": (3, 4, 5),
+    "summer": (6, 7, 8),
+    "fall": (9, 10, 11),
+    "winter": (12, 1, 2),
+}
+
+# Season for each month, indexed by month number - 1
+MONTH_TO_SEASON = (
+    "winter",
+    "winter",
+    "spring",
+    "spring",
+    "spring",
+    "summer",
+    "summer",
+    "summer",
+    "fall",
+    "fall",
+    "fall",
+    "winter",
+)
+
+
+# Idle connections kept open for reuse across requests, each with the
+# database version (see get_db_version) it was opened against
+POOL_SIZE = 8
+connection_pool: "queue.Queue[Tuple[int, sqlite3.Connection]]" = queue.Queue(
+    maxsize=POOL_SIZE
+)
+
+# Prepared statements kept per connection, keyed by SQL text. Queries are
+# built deterministically, so each filter combination always produces the
+# same text and is only compiled once per pooled connection; the default of
+# 128 is too small for every years/months/seasons placeholder variant.
+STATEMENT_CACHE_SIZE = 512
+
+
+def create_db_connection() -> sqlite3.Connection:
+    """Open a new database connection with the API's settings applied."""
+    # Shared across FastAPI's worker threads; the API only reads, so
+    # autocommit mode avoids implicit transactions
+    conn = sqlite3.connect(
+        DB_PATH,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
 
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections with proper cleanup."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """
+    Context manager that borrows a connection from the pool.
+
+    A new connection is opened when the pool is empty, and connections
+    beyond POOL_SIZE are closed instead of being returned to it.
+
+    Connections opened before load_data.py last rewrote the database are
+    closed rather than reused. compose.yml mounts only spotify.db, so the
+    loader and the API keep separate -wal/-shm files; the API's -shm never
+    changes, and a long-lived connection would keep serving its page cache
+    from before the reload as if it were still valid.
+    """
+    version = get_db_version()
+    while True:
+        try:
+            conn_version, conn = connection_pool.get_nowait()
+        except queue.Empty:
+            conn = create_db_connection()
+            break
+        if conn_version == version:
+            break
+        conn.close()
     try:
         yield conn
     finally:
-        conn.close()
+        if get_db_version() != version:
+            conn.close()
+        else:
+            try:
+                connection_pool.put_nowait((version, conn))
+            except queue.Full:
+                conn.close()
 
 
 @app.get("/")
@@ -49,6 +155,99 @@ def read_root():
     return {"message": "Spotify Analytics API", "status": "running"}
 
 
+def get_db_version() -> int:
+    """
+    Return a stamp that changes whenever the database file is rewritten.
+
+    Used as part of cache keys so cached results are dropped automatically
+    after load_data.py reloads the data.
+    """
+    try:
+        return DB_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def year_filter(years: Optional[List[int]]) -> Tuple[int, ...]:
+    """Normalize a years query parameter into a hashable cache key."""
+    return tuple(sorted(set(years))) if years else ()
+
+
+@lru_cache(maxsize=64)
+def query_available_years(db_version: int) -> Tuple[str, ...]:
+    """Distinct years in the songs table, newest first (cached per DB version)."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        # Distinct years from the precomputed year column
+        query = """
+            SELECT DISTINCT year
+            FROM songs
+            WHERE year IS NOT NULL
+            ORDER BY year DESC
+        """
+
+        cursor.execute(query)
+        return tuple(str(year) for (year,) in cursor)
+
+
+@lru_cache(maxsize=64)
+def query_available_months(
+    db_version: int, years: Tuple[int, ...]
+) -> Tuple[Dict[str, str], ...]:
+    """Distinct year-month pairs, newest first (cached per DB version and years)."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        # Build WHERE clause for year filtering
+        where_clause = ""
+        if years:
+            placeholders = ",".join(["?" for _ in years])
+            where_clause = f"WHERE year IN ({placeholders})"
+
+        # Extract distinct year-month combinations
+        query = f"""
+            SELECT DISTINCT year, month
+            FROM songs
+            {where_clause}
+            ORDER BY year DESC, month DESC
+        """
+
+        cursor.execute(query, years)
+        return tuple(
+            {"year": str(year), "month": f"{month:02d}"} for year, month in cursor
+        )
+
+
+@lru_cache(maxsize=64)
+def query_available_seasons(db_version: int, years: Tuple[int, ...]) -> Tuple[str, ...]:
+    """Seasons with any listening, in calendar order (cached per DB version and years)."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        # Build WHERE clause for year filtering
+        where_clause = ""
+        if years:
+            placeholders = ",".join(["?" for _ in years])
+            where_clause = f"WHERE year IN ({placeholders})"
+
+        # Extract distinct months
+        query = f"""
+            SELECT DISTINCT month
+            FROM songs
+            {where_clause}
+            ORDER BY month
+        """
+
+        cursor.execute(query, years)
+
+        # Convert months to seasons and get unique values
+        seasons = {MONTH_TO_SEASON[month - 1] for (month,) in cursor if month}
+
+    # Return in logical order
+    return tuple(s for s in SEASON_TO_MONTHS if s in seasons)
+
+
 @app.get("/api/available-years")
 def get_available_years():
     """
@@ -56,29 +255,15 @@ def get_available_years():
     Returns a sorted list of years in descending order.
     """
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-
-            # Extract distinct years from endTime
-            query = """
-                SELECT DISTINCT strftime('%Y', endTime) as year
-                FROM songs
-                WHERE year IS NOT NULL
-                ORDER BY year DESC
-            """
-
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            years = [row["year"] for row in rows]
-
-        return {"years": years}
+        years = query_available_years(get_db_version())
+        return {"years": list(years)}
     except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 @app.get("/api/available-months")
 def get_available_months(
-    years: Optional[List[str]] = Query(None, description="Filter by specific years")
+    years: Optional[List[int]] = Query(None, description="Filter by specific years")
 ):
     """
     Get all available year-month combinations from the streaming history.
@@ -86,52 +271,15 @@ def get_available_months(
     Returns a list of objects with year and month.
     """
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-
-            # Build WHERE clause for year filtering
-            where_clause = ""
-            params = []
-            if years and len(years) > 0:
-                placeholders = ",".join(["?" for _ in years])
-                where_clause = f"WHERE strftime('%Y', endTime) IN ({placeholders})"
-                params = years
-
-            # Extract distinct year-month combinations
-            query = f"""
-                SELECT DISTINCT 
-                    strftime('%Y', endTime) as year,
-                    strftime('%m', endTime) as month
-                FROM songs
-                {where_clause}
-                ORDER BY year DESC, month DESC
-            """
-
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            months = [{"year": row["year"], "month": row["month"]} for row in rows]
-
-        return {"months": months}
+        months = query_available_months(get_db_version(), year_filter(years))
+        return {"months": [dict(month) for month in months]}
     except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-def get_season_from_month(month: str) -> str:
-    """Convert month number to season."""
-    month_int = int(month)
-    if month_int in [12, 1, 2]:
-        return "winter"
-    elif month_int in [3, 4, 5]:
-        return "spring"
-    elif month_int in [6, 7, 8]:
-        return "summer"
-    else:  # 9, 10, 11
-        return "fall"
-
-
 @app.get("/api/available-seasons")
 def get_available_seasons(
-    years: Optional[List[str]] = Query(None, description="Filter by specific years")
+    years: Optional[List[int]] = Query(None, description="Filter by specific years")
 ):
     """
     Get all available seasons from the streaming history.
@@ -139,50 +287,19 @@ def get_available_seasons(
     Returns a list of available seasons.
     """
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-
-            # Build WHERE clause for year filtering
-            where_clause = ""
-            params = []
-            if years and len(years) > 0:
-                placeholders = ",".join(["?" for _ in years])
-                where_clause = f"WHERE strftime('%Y', endTime) IN ({placeholders})"
-                params = years
-
-            # Extract distinct months
-            query = f"""
-                SELECT DISTINCT strftime('%m', endTime) as month
-                FROM songs
-                {where_clause}
-                ORDER BY month
-            """
-
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-
-            # Convert months to seasons and get unique values
-            seasons = set()
-            for row in rows:
-                if row["month"]:
-                    seasons.add(get_season_from_month(row["month"]))
-
-            # Return in logical order
-            season_order = ["spring", "summer", "fall", "winter"]
-            available_seasons = [s for s in season_order if s in seasons]
-
-        return {"seasons": available_seasons}
+        seasons = query_available_seasons(get_db_version(), year_filter(years))
+        return {"seasons": list(seasons)}
     except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 @app.get("/api/stats")
 def get_stats(
-    years: Optional[List[str]] = Query(
-        None, description="Filter by years (e.g., ['2023', '2024'])"
+    years: Optional[List[int]] = Query(
+        None, description="Filter by years (e.g., [2023, 2024])"
     ),
-    months: Optional[List[str]] = Query(
-        None, description="Filter by months (e.g., ['01', '02'] for Jan, Feb)"
+    months: Optional[List[Month]] = Query(
+        None, description="Filter by months 1-12 (e.g., [1, 2] or ['01', '02'])"
     ),
     seasons: Optional[List[str]] = Query(
         None, description="Filter by seasons (e.g., ['spring', 'summer'])"
@@ -193,7 +310,7 @@ def get_stats(
 
     Args:
         years: Optional list of years to filter by.
-        months: Optional list of months (01-12) to filter by.
+        months: Optional list of months (1-12) to filter by.
         seasons: Optional list of seasons ('spring', 'summer', 'fall', 'winter') to filter by.
 
     Returns:
@@ -210,89 +327,87 @@ def get_stats(
             # Filter by years
             if years and len(years) > 0:
                 placeholders = ",".join(["?" for _ in years])
-                where_conditions.append(f"strftime('%Y', endTime) IN ({placeholders})")
+                where_conditions.append(f"year IN ({placeholders})")
                 params.extend(years)
 
             # Filter by months or seasons (mutually exclusive preference to seasons if both provided)
             if seasons and len(seasons) > 0:
                 # Convert seasons to month numbers
-                season_months = []
-                for season in seasons:
-                    if season == "spring":
-                        season_months.extend(["03", "04", "05"])
-                    elif season == "summer":
-                        season_months.extend(["06", "07", "08"])
-                    elif season == "fall":
-                        season_months.extend(["09", "10", "11"])
-                    elif season == "winter":
-                        season_months.extend(["12", "01", "02"])
+                season_months = [
+                    m for s in seasons for m in SEASON_TO_MONTHS.get(s, ())
+                ]
 
                 if season_months:
                     placeholders = ",".join(["?" for _ in season_months])
-                    where_conditions.append(
-                        f"strftime('%m', endTime) IN ({placeholders})"
-                    )
+                    where_conditions.append(f"month IN ({placeholders})")
                     params.extend(season_months)
             elif months and len(months) > 0:
                 # Only use months filter if seasons not specified
                 placeholders = ",".join(["?" for _ in months])
-                where_conditions.append(f"strftime('%m', endTime) IN ({placeholders})")
+                where_conditions.append(f"month IN ({placeholders})")
                 params.extend(months)
 
             where_clause = ""
             if where_conditions:
                 where_clause = "WHERE " + " AND ".join(where_conditions)
 
-            # Calculate total time played
-            total_query = f"""
-                SELECT SUM(msPlayed) as total_ms
-                FROM songs
+            # Compute the total, top artists and top songs in one statement.
+            # The total and top artists come from the small daily rollups;
+            # only top songs need the songs table. With filters, the matching
+            # songs are materialized first via the (year, month) index; without
+            # filters, letting SQLite inline the CTE keeps the index-only scan
+            # over the covering track index.
+            materialization = "MATERIALIZED" if where_clause else "NOT MATERIALIZED"
+            stats_query = f"""
+                WITH filtered AS {materialization} (
+                    SELECT artistName, trackName, msPlayed
+                    FROM songs
+                    {where_clause}
+                )
+                SELECT 'total' as kind, NULL, NULL, SUM(total_ms) as duration_ms
+                FROM daily_rollup
                 {where_clause}
+                UNION ALL
+                SELECT * FROM (
+                    SELECT 'artist', NULL, artistName, SUM(total_ms) as duration_ms
+                    FROM artist_daily
+                    {where_clause}
+                    GROUP BY artistName
+                    ORDER BY duration_ms DESC
+                    LIMIT 20
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT 'song', trackName, artistName, SUM(msPlayed) as duration_ms
+                    FROM filtered
+                    WHERE trackName IS NOT NULL AND artistName IS NOT NULL
+                    GROUP BY trackName, artistName
+                    ORDER BY duration_ms DESC
+                    LIMIT 20
+                )
             """
-            cursor.execute(total_query, params)
-            total_result = cursor.fetchone()
-            total_ms_played = total_result["total_ms"] or 0
-
-            # Get top artists
-            artists_query = f"""
-                SELECT 
-                    artistName,
-                    SUM(msPlayed) as duration_ms
-                FROM songs
-                {where_clause}
-                GROUP BY artistName
-                HAVING artistName IS NOT NULL
-                ORDER BY duration_ms DESC
-                LIMIT 20
-            """
-            cursor.execute(artists_query, params)
-            top_artists = [
-                {"artistName": row["artistName"], "duration_ms": row["duration_ms"]}
-                for row in cursor.fetchall()
-            ]
-
-            # Get top songs
-            songs_query = f"""
-                SELECT 
-                    trackName,
-                    artistName,
-                    SUM(msPlayed) as duration_ms
-                FROM songs
-                {where_clause}
-                GROUP BY trackName, artistName
-                HAVING trackName IS NOT NULL AND artistName IS NOT NULL
-                ORDER BY duration_ms DESC
-                LIMIT 20
-            """
-            cursor.execute(songs_query, params)
-            top_songs = [
-                {
-                    "trackName": row["trackName"],
-                    "artistName": row["artistName"],
-                    "duration_ms": row["duration_ms"],
-                }
-                for row in cursor.fetchall()
-            ]
+            # The same filter appears once per source table
+            cursor.execute(stats_query, params * 3)
+
+            # Split the combined rows back into their sections
+            total_ms_played = 0
+            top_artists = []
+            top_songs = []
+            for kind, track_name, artist_name, duration_ms in cursor:
+                if kind == "total":
+                    total_ms_played = duration_ms or 0
+                elif kind == "artist":
+                    top_artists.append(
+                        {"artistName": artist_name, "duration_ms": duration_ms}
+                    )
+                else:
+                    top_songs.append(
+                        {
+                            "trackName": track_name,
+                            "artistName": artist_name,
+                            "duration_ms": duration_ms,
+                        }
+                    )
 
         return {
             "total_ms_played": total_ms_played,
@@ -305,8 +420,10 @@ def get_stats(
 
 @app.get("/api/calendar-data")
 def get_calendar_data(
-    year: Optional[str] = Query(None, description="Filter by specific year"),
-    month: Optional[str] = Query(None, description="Filter by specific month (01-12)"),
+    year: Optional[int] = Query(None, description="Filter by specific year"),
+    month: Optional[int] = Query(
+        None, ge=1, le=12, description="Filter by specific month (1-12)"
+    ),
 ):
     """
     Get listening data aggregated by date for calendar view.
@@ -320,40 +437,31 @@ def get_calendar_data(
             where_conditions = []
             params = []
 
-            if year:
-                where_conditions.append("strftime('%Y', endTime) = ?")
+            if year is not None:
+                where_conditions.append("year = ?")
                 params.append(year)
 
-            if month:
-                where_conditions.append("strftime('%m', endTime) = ?")
+            if month is not None:
+                where_conditions.append("month = ?")
                 params.append(month)
 
             where_clause = ""
             if where_conditions:
                 where_clause = "WHERE " + " AND ".join(where_conditions)
 
-            # Get data aggregated by date
+            # Get data aggregated by date (precomputed at load time)
             query = f"""
-                SELECT 
-                    DATE(endTime) as date,
-                    COUNT(*) as stream_count,
-                    SUM(msPlayed) as total_ms
-                FROM songs
+                SELECT date, stream_count, total_ms
+                FROM daily_rollup
                 {where_clause}
-                GROUP BY DATE(endTime)
                 ORDER BY date
             """
 
             cursor.execute(query, params)
-            rows = cursor.fetchall()
 
             calendar_data = [
-                {
-                    "date": row["date"],
-                    "stream_count": row["stream_count"],
-                    "total_ms": row["total_ms"],
-                }
-                for row in rows
+                {"date": day, "stream_count": stream_count, "total_ms": total_ms}
+                for day, stream_count, total_ms in cursor
             ]
 
         return {"calendar_data": calendar_data}
@@ -362,48 +470,77 @@ def get_calendar_data(
 
 
 @app.get("/api/daily-songs")
-def get_daily_songs(date: str = Query(..., description="Date in YYYY-MM-DD format")):
+def get_daily_songs(
+    date: str = Query(..., description="Date in YYYY-MM-DD format"),
+    limit: Optional[int] = Query(
+        None, ge=1, description="Maximum number of songs to return (default: all)"
+    ),
+    offset: int = Query(0, ge=0, description="Number of songs to skip"),
+):
     """
     Get all songs listened to on a specific date with full metadata.
-    Returns songs in chronological order.
+    Returns songs in chronological order, optionally one page at a time.
     """
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
 
-            # Get all streams for the specified date
-            # Note: songs table has: endTime, msPlayed, artistName, trackName, albumName, trackUri
+            # Get the streams for the specified date; idx_songs_daily covers
+            # every column here, so this is a single index range scan
+            # Note: songs table has: endTime (Unix seconds), msPlayed, artistName,
+            # trackName, albumName, trackUri, year, month, date
             query = """
                 SELECT 
                     trackName,
                     artistName,
                     albumName,
                     msPlayed,
-                    endTime
+                    strftime('%Y-%m-%dT%H:%M:%SZ', endTime, 'unixepoch') as endTime
                 FROM songs
-                WHERE DATE(endTime) = ?
-                ORDER BY endTime ASC
+                WHERE date = ?
+                ORDER BY songs.endTime ASC
+                LIMIT ? OFFSET ?
             """
 
-            cursor.execute(query, (date,))
-            rows = cursor.fetchall()
+            # SQLite treats a negative LIMIT as "no limit"
+            cursor.execute(query, (date, -1 if limit is None else limit, offset))
 
             songs = [
                 {
-                    "trackName": row["trackName"],
-                    "artistName": row["artistName"],
-                    "albumName": row["albumName"],
-                    "msPlayed": row["msPlayed"],
-                    "endTime": row["endTime"],
+                    "trackName": track_name,
+                    "artistName": artist_name,
+                    "albumName": album_name,
+                    "msPlayed": ms_played,
+                    "endTime": end_time,
                 }
-                for row in rows
+                for track_name, artist_name, album_name, ms_played, end_time in cursor
             ]
 
-        return {"date": date, "song_count": len(songs), "songs": songs}
+            # Total for the whole day, not just this page, so paging clients
+            # know how many songs there are
+            cursor.execute(
+                "SELECT stream_count FROM daily_rollup WHERE date = ?", (date,)
+            )
+            row = cursor.fetchone()
+            song_count = row[0] if row else 0
+
+        return {"date": date, "song_count": song_count, "songs": songs}
     except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+def build_fts_query(query: str) -> str:
+    """
+    Convert free-text search input into an FTS5 MATCH expression.
+
+    Each whitespace-separated word becomes a quoted prefix term, so user
+    input can never inject FTS5 syntax and partially typed words match.
+    """
+    return " AND ".join(
+        '"{}"*'.format(term.replace('"', '""')) for term in query.split()
+    )
+
+
 @app.get("/api/search")
 def search_songs_and_artists(
     query: str = Query(
@@ -414,47 +551,47 @@ def search_songs_and_artists(
     Search for songs and artists matching the query.
     Returns matching artists and tracks.
     """
+    match = build_fts_query(query)
+    if not match:
+        return {"artists": [], "tracks": []}
+
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
 
-            # Search for matching artists
+            # Search for matching artists via the full-text index
             artists_query = """
-                SELECT DISTINCT artistName, COUNT(*) as play_count
-                FROM songs
-                WHERE artistName LIKE ?
+                SELECT artistName, COUNT(*) as play_count
+                FROM songs_fts
+                WHERE songs_fts MATCH ?
                 GROUP BY artistName
                 ORDER BY play_count DESC
                 LIMIT 10
             """
-            cursor.execute(artists_query, (f"%{query}%",))
+            cursor.execute(artists_query, (f"artistName : ({match})",))
             artists = [
-                {
-                    "name": row["artistName"],
-                    "type": "artist",
-                    "play_count": row["play_count"],
-                }
-                for row in cursor.fetchall()
+                {"name": artist_name, "type": "artist", "play_count": play_count}
+                for artist_name, play_count in cursor
             ]
 
-            # Search for matching tracks
+            # Search for matching tracks (by track or artist name)
             tracks_query = """
                 SELECT trackName, artistName, COUNT(*) as play_count
-                FROM songs
-                WHERE trackName LIKE ? OR artistName LIKE ?
+                FROM songs_fts
+                WHERE songs_fts MATCH ?
                 GROUP BY trackName, artistName
                 ORDER BY play_count DESC
                 LIMIT 20
             """
-            cursor.execute(tracks_query, (f"%{query}%", f"%{query}%"))
+            cursor.execute(tracks_query, (f"{{trackName artistName}} : ({match})",))
             tracks = [
                 {
-                    "trackName": row["trackName"],
-                    "artistName": row["artistName"],
+                    "trackName": track_name,
+                    "artistName": artist_name,
                     "type": "track",
-                    "play_count": row["play_count"],
+                    "play_count": play_count,
                 }
-                for row in cursor.fetchall()
+                for track_name, artist_name, play_count in cursor
             ]
 
         return {"artists": artists, "tracks": tracks}
@@ -493,11 +630,11 @@ def get_listening_trends(
                 params.append(track_name)
 
             if start_date:
-                where_conditions.append("DATE(endTime) >= ?")
+                where_conditions.append("date >= ?")
                 params.append(start_date)
 
             if end_date:
-                where_conditions.append("DATE(endTime) <= ?")
+                where_conditions.append("date <= ?")
                 params.append(end_date)
 
             where_clause = ""
@@ -507,39 +644,44 @@ def get_listening_trends(
             # Determine date grouping based on granularity
             if granularity == "day":
                 date_format = "%Y-%m-%d"
-                date_group = "DATE(endTime)"
+                date_group = "date"
             elif granularity == "week":
                 date_format = "%Y-W%W"  # Year-Week format
-                date_group = "strftime('%Y-W%W', endTime)"
+                date_group = "strftime('%Y-W%W', date)"
             elif granularity == "year":
                 date_format = "%Y"
-                date_group = "strftime('%Y', endTime)"
+                date_group = "CAST(year AS TEXT)"
             else:  # default to month
                 date_format = "%Y-%m"
-                date_group = "strftime('%Y-%m', endTime)"
+                date_group = "printf('%04d-%02d', year, month)"
+
+            # Read from the smallest table that can answer the query: track
+            # trends need individual plays, artist trends can use the
+            # per-artist rollup, and overall trends the per-day rollup
+            if track_name:
+                source = "songs"
+                play_count, total_ms = "COUNT(*)", "SUM(msPlayed)"
+            else:
+                source = "artist_daily" if artist_name else "daily_rollup"
+                play_count, total_ms = "SUM(stream_count)", "SUM(total_ms)"
 
             # Get aggregated data
             query = f"""
                 SELECT 
                     {date_group} as period,
-                    COUNT(*) as play_count,
-                    SUM(msPlayed) as total_ms
-                FROM songs
+                    {play_count} as play_count,
+                    {total_ms} as total_ms
+                FROM {source}
                 {where_clause}
                 GROUP BY period
                 ORDER BY period ASC
             """
 
             cursor.execute(query, params)
-            rows = cursor.fetchall()
 
             trends = [
-                {
-                    "period": row["period"],
-                    "play_count": row["play_count"],
-                    "total_ms": row["total_ms"],
-                }
-                for row in rows
+                {"period": period, "play_count": play_count, "total_ms": total_ms}
+                for period, play_count, total_ms in cursor
             ]
 
         return {
@@ -560,9 +702,9 @@ def health_check():
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) as count FROM songs")
-            result = cursor.fetchone()
+            cursor.execute("SELECT COUNT(*) FROM songs")
+            (total_streams,) = cursor.fetchone()
 
-        return {"status": "healthy", "total_streams": result["count"]}
+        return {"status": "healthy", "total_streams": total_streams}
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Service unavailable: {str(e)}")